@@ -1,17 +1,38 @@
 #!/usr/bin/env python3
 import os
-import json
+import logging
+import random
+import re
+import sys
 import time
+import unicodedata
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Set
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple, TypeVar
 
 from dotenv import load_dotenv
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
 import spotipy
+from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyOAuth, SpotifyOauthError
 from dotenv import load_dotenv
+from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
+from urllib3.util.retry import Retry
 
 from yandex_music import Client
-from yandex_music.exceptions import TimedOutError, UnauthorizedError
+from yandex_music.exceptions import (
+    BadRequestError,
+    NetworkError,
+    NotFoundError,
+    TimedOutError,
+    UnauthorizedError,
+)
 
 # ===================== НАСТРОЙКИ / ENV =====================
 
@@ -27,25 +48,176 @@ SPOTIFY_SCOPE = "user-library-read"
 
 YANDEX_MUSIC_TOKEN = os.getenv("YANDEX_MUSIC_TOKEN")
 
+# DEBUG — подробный вывод по каждому треку, INFO — только результаты
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
 STATE_FILE = os.getenv("STATE_FILE", "spotify_yandex_state.json")
 
-STATE_DEFAULT = {
-    "processed_spotify_ids": [],
-    "last_spotify_added_at": None,  # ISO-строка, например "2025-12-02T10:33:56Z"
-}
+# Сколько поисковых запросов к Я.Музыке выполнять параллельно.
+# Слишком большое значение упирается в лимиты API.
+YANDEX_SEARCH_WORKERS = int(os.getenv("YANDEX_SEARCH_WORKERS", "8"))
+
+# Сколько страниц Spotify качать параллельно при первом импорте
+# и сколько страниц запрашивать наперёд при инкрементальной синхронизации.
+SPOTIFY_FETCH_WORKERS = int(os.getenv("SPOTIFY_FETCH_WORKERS", "5"))
+SPOTIFY_PREFETCH_PAGES = 3
+
+# Сколько лайков отправлять в Я.Музыку одним запросом. По умолчанию 1 — по одному,
+# чтобы сохранить хронологию "Мне нравится": порядок треков внутри одной пачки
+# Я.Музыка может не сохранить. Большие пачки (например, 50) ускоряют первый импорт.
+YANDEX_LIKE_BATCH = max(1, int(os.getenv("YANDEX_LIKE_BATCH", "1")))
+
+# Как часто (в обработанных треках) сбрасывать состояние на диск.
+# В конце прогона состояние сохраняется всегда.
+STATE_SAVE_EVERY = 25
+
+# Сколько первых результатов поиска Я.Музыки сравнивать с треком Spotify
+YANDEX_MATCH_CANDIDATES = 5
+# Разница длительности (в секундах), которая "стоит" одного совпавшего поля
+DURATION_PENALTY_SECONDS = 30
+
+# Длина обычного Spotify ID (base62). Такие ID храним одной склеенной строкой.
+SPOTIFY_ID_LEN = 22
+
+# Сколько доверяем закэшированному результату поиска в Я.Музыке (в секундах).
+# Кэш держит только треки, которые уже искали, но ещё не обработали (прогон упал
+# или лайк не прошёл) — следующий запуск не ищет их заново. Обработанные треки
+# (в том числе "не найдено") больше не ищутся, и их записи из кэша удаляются.
+SEARCH_CACHE_TTL = 7 * 24 * 3600
+
+# Поиск не удался из-за временных ошибок API (повторы исчерпаны) — это не "не найдено":
+# такой трек не помечаем обработанным и пробуем снова в следующий запуск
+SEARCH_FAILED = "<search failed>"
 
 # ===========================================================
 
+log = logging.getLogger("spotify_2_yandex")
+
+T = TypeVar("T")
+
+RETRYABLE_SPOTIFY_STATUSES = (429, 500, 502, 503)
+
+
+def is_retryable_error(e: Exception) -> bool:
+    """Временная ошибка API (таймаут, сеть, 429/5xx), которую имеет смысл повторить."""
+    if isinstance(e, TimedOutError):
+        return True
+    if isinstance(e, NetworkError):
+        # 400/404 от Я.Музыки повторять бессмысленно
+        return not isinstance(e, (BadRequestError, NotFoundError))
+    if isinstance(e, SpotifyException):
+        return e.http_status in RETRYABLE_SPOTIFY_STATUSES
+    return False
+
+
+def get_retry_after(e: Exception) -> Optional[float]:
+    """Достаём Retry-After (в секундах) из ответа API, если он есть."""
+    headers = getattr(e, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_backoff(
+    fn: Callable[[], T],
+    *,
+    attempts: int = 5,
+    base: float = 0.5,
+    cap: float = 30,
+    label: str = "запросе к API",
+) -> T:
+    """
+    Вызываем fn() с повторами при временных ошибках API.
+
+    Пауза между попытками растёт экспоненциально (с потолком cap и случайным
+    разбросом), а если сервер прислал Retry-After — ждём ровно столько.
+    После последней неудачной попытки пробрасываем исключение дальше.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if not is_retryable_error(e) or attempt == attempts - 1:
+                raise
+
+            delay = get_retry_after(e)
+            if delay is None:
+                backoff = base * 2 ** attempt
+                delay = min(cap, backoff) + random.uniform(0, 0.5 * backoff)
+
+            log.warning(
+                "   Временная ошибка API при %s: %s — повтор через %.1f с (попытка %d/%d)",
+                label,
+                type(e).__name__,
+                delay,
+                attempt + 1,
+                attempts,
+            )
+            time.sleep(delay)
+
+    raise AssertionError("unreachable")
+
+
+@dataclass(slots=True, frozen=True)
+class SpotifyLike:
+    """Любимый трек Spotify — только нужные для синхронизации поля."""
+
+    id: str
+    name: str
+    artists: Tuple[str, ...]
+    album_name: str
+    duration_ms: int
+    added_at: Optional[str]  # ISO-строка от Spotify
+
+    # нормализованные название и артисты — считаем один раз, а не на каждого кандидата
+    name_norm: str = field(init=False, repr=False, compare=False)
+    artists_norm: Tuple[str, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "name_norm", normalize_text(self.name))
+        object.__setattr__(self, "artists_norm", tuple(normalize_text(a) for a in self.artists))
+
+
+def normalize_text(s: str) -> str:
+    """Приводим строку к виду для сравнения: NFKD + casefold, без краевых пробелов."""
+    return unicodedata.normalize("NFKD", s).casefold().strip()
+
+
+def build_spotify_session() -> requests.Session:
+    """
+    Общая HTTP-сессия для spotipy: keep-alive и пул соединений под параллельную
+    загрузку страниц. Здесь повторяем только обрывы соединения; 429/5xx повторяет
+    call_with_backoff (с учётом Retry-After), чтобы не множить повторы двумя слоями.
+    """
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=3,
+        status=0,
+        backoff_factor=0.5,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
 
 def init_spotify_client() -> spotipy.Spotify:
     """Инициализируем клиента Spotify (spotipy) с понятными ошибками."""
     if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
-        print("❌ SPOTIFY_CLIENT_ID или SPOTIFY_CLIENT_SECRET не заданы.")
-        print("   Откройте .env и заполните значения Spotify API.")
+        log.error("❌ SPOTIFY_CLIENT_ID или SPOTIFY_CLIENT_SECRET не заданы.")
+        log.error("   Откройте .env и заполните значения Spotify API.")
         raise RuntimeError("Не заданы ключи Spotify (SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET) в .env")
 
-    print("Инициализация Spotify клиента...")
-    print("   Использую redirect_uri:", repr(SPOTIFY_REDIRECT_URI))
+    log.info("Инициализация Spotify клиента...")
+    log.info("   Использую redirect_uri: %r", SPOTIFY_REDIRECT_URI)
 
     try:
         auth_manager = SpotifyOAuth(
@@ -58,45 +230,51 @@ def init_spotify_client() -> spotipy.Spotify:
         )
 
         # Можно сразу дернуть что-то простое, чтобы форсировать проверку токена/настроек
-        sp = spotipy.Spotify(auth_manager=auth_manager)
+        sp = spotipy.Spotify(
+            auth_manager=auth_manager,
+            requests_session=build_spotify_session(),
+        )
         return sp
 
     except SpotifyOauthError as e:
         msg = str(e)
 
-        print("\n❌ Ошибка авторизации в Spotify.")
-        print("   Проверьте, правильно ли заполнен файл .env:")
+        log.error("\n❌ Ошибка авторизации в Spotify.")
+        log.error("   Проверьте, правильно ли заполнен файл .env:")
 
-        print("   - SPOTIFY_CLIENT_ID")
-        print("   - SPOTIFY_CLIENT_SECRET")
-        print("   - SPOTIFY_REDIRECT_URI (должен совпадать с настройками в Spotify Dashboard)")
+        log.error("   - SPOTIFY_CLIENT_ID")
+        log.error("   - SPOTIFY_CLIENT_SECRET")
+        log.error("   - SPOTIFY_REDIRECT_URI (должен совпадать с настройками в Spotify Dashboard)")
 
         if "INVALID_CLIENT" in msg or "invalid_client" in msg:
-            print("\n   Детали: Spotify вернул INVALID_CLIENT —")
-            print("   это почти всегда означает неправильный Client ID / Secret.")
+            log.error("\n   Детали: Spotify вернул INVALID_CLIENT —")
+            log.error("   это почти всегда означает неправильный Client ID / Secret.")
         if "redirect_uri" in msg:
-            print("\n   Детали: проблема с redirect_uri.")
-            print("   Убедитесь, что в Spotify Dashboard добавлен ровно такой Redirect URI:")
-            print("   ", SPOTIFY_REDIRECT_URI)
+            log.error("\n   Детали: проблема с redirect_uri.")
+            log.error("   Убедитесь, что в Spotify Dashboard добавлен ровно такой Redirect URI:")
+            log.error("    %s", SPOTIFY_REDIRECT_URI)
 
-        print(f"\n   Техническое сообщение от Spotify: {msg}\n")
+        log.error("\n   Техническое сообщение от Spotify: %s\n", msg)
         raise
 
     except Exception as e:
-        print("\n❌ Не удалось инициализировать клиента Spotify.")
-        print(f"   Ошибка: {e}")
-        print("   Проверьте интернет и настройки .env.")
+        log.error("\n❌ Не удалось инициализировать клиента Spotify.")
+        log.error("   Ошибка: %s", e)
+        log.error("   Проверьте интернет и настройки .env.")
         raise
 
 
 def init_yandex_client() -> Client:
     """Инициализируем клиента Яндекс.Музыки."""
     if not YANDEX_MUSIC_TOKEN:
-        print("❌ YANDEX_MUSIC_TOKEN не задан. Проверьте файл .env")
+        log.error("❌ YANDEX_MUSIC_TOKEN не задан. Проверьте файл .env")
         raise RuntimeError("Не задан токен Яндекс.Музыки (YANDEX_MUSIC_TOKEN) в .env")
 
-    print("Инициализация Yandex Music клиента...")
-    client = Client(YANDEX_MUSIC_TOKEN).init()
+    log.info("Инициализация Yandex Music клиента...")
+    client = call_with_backoff(
+        Client(YANDEX_MUSIC_TOKEN).init,
+        label="инициализации Я.Музыки",
+    )
     return client
 
 
@@ -113,6 +291,29 @@ def parse_spotify_ts(ts: Optional[str]) -> Optional[datetime]:
         return None
 
 
+# Канонический вид added_at у Spotify: такие строки можно сравнивать напрямую
+SPOTIFY_TS_RE = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z")
+
+
+def is_not_newer_than(
+    added_raw: Optional[str],
+    since_raw: Optional[str],
+    since_dt: datetime,
+) -> bool:
+    """
+    Лайк added_raw не новее отметки since?
+
+    Если обе строки в каноническом виде "YYYY-MM-DDTHH:MM:SSZ", они
+    упорядочены лексикографически, и парсить datetime не нужно.
+    """
+    if not added_raw:
+        return False
+    if since_raw and len(added_raw) == len(since_raw) and added_raw.endswith("Z"):
+        return added_raw <= since_raw
+    added_dt = parse_spotify_ts(added_raw)
+    return bool(added_dt and added_dt <= since_dt)
+
+
 def format_spotify_ts(dt: Optional[datetime]) -> Optional[str]:
     """Форматируем datetime в строку вида 2025-12-02T10:33:56Z."""
     if not dt:
@@ -120,134 +321,322 @@ def format_spotify_ts(dt: Optional[datetime]) -> Optional[str]:
     return dt.astimezone(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
+def is_search_cache_entry_fresh(entry: Any, now: float) -> bool:
+    """Запись кэша поиска корректна и ещё не протухла."""
+    if not isinstance(entry, dict):
+        return False
+    return now - (entry.get("queried_at") or 0) < SEARCH_CACHE_TTL
+
+
+def _fresh_state() -> Dict[str, Any]:
+    """
+    Пустое состояние в том виде, в каком оно живёт в памяти.
+    Каждый вызов создаёт новые set/dict, так что копии ничего не разделяют.
+
+    На диске processed_spotify_ids хранятся иначе: обычные ID — одной склеенной
+    строкой в processed_spotify_ids_packed, нестандартные (если вдруг) — списком.
+    """
+    return {
+        "processed_spotify_ids": set(),
+        "last_spotify_added_at": None,  # ISO-строка, например "2025-12-02T10:33:56Z"
+        # spotify_id → {"like_id": "track_id:album_id" | None, "queried_at": unix-время}
+        "yandex_search_cache": {},
+        # лайки Я.Музыки ("track_id:album_id") и ревизия библиотеки, при которой их получили
+        "yandex_liked_cache": set(),
+        "yandex_liked_cache_revision": None,
+    }
+
+
 def load_state() -> Dict[str, Any]:
     """Загружаем состояние (обработанные spotify_id + last_spotify_added_at) из JSON-файла."""
     if not os.path.exists(STATE_FILE):
-        return dict(STATE_DEFAULT)
+        return _fresh_state()
 
     try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(STATE_FILE, "rb") as f:
+            data = orjson.loads(f.read())
     except Exception:
         # файл битый — начинаем с нуля
-        return dict(STATE_DEFAULT)
+        return _fresh_state()
+    if not isinstance(data, dict):
+        return _fresh_state()
+
+    # неизвестные поля переносим как есть, известные разбираем ниже
+    state = {**data, **_fresh_state()}
+    state.pop("processed_spotify_ids_packed", None)
+
+    # processed_spotify_ids приведём к множеству строк — так и держим в памяти
+    processed: Set[str] = state["processed_spotify_ids"]
+    ids = data.get("processed_spotify_ids")
+    if isinstance(ids, list):
+        processed.update(str(x) for x in ids)
+    packed = data.get("processed_spotify_ids_packed")
+    if isinstance(packed, str):
+        processed.update(
+            packed[i : i + SPOTIFY_ID_LEN] for i in range(0, len(packed), SPOTIFY_ID_LEN)
+        )
+
+    if isinstance(data.get("last_spotify_added_at"), str):
+        state["last_spotify_added_at"] = data["last_spotify_added_at"]
 
-    # гарантируем наличие нужных полей
-    for k, v in STATE_DEFAULT.items():
-        data.setdefault(k, v)
+    search_cache = data.get("yandex_search_cache")
+    if isinstance(search_cache, dict):
+        state["yandex_search_cache"].update(search_cache)
 
-    # processed_spotify_ids приведём к списку строк
-    if not isinstance(data.get("processed_spotify_ids"), list):
-        data["processed_spotify_ids"] = []
-    data["processed_spotify_ids"] = [str(x) for x in data["processed_spotify_ids"]]
+    # кэш лайков Я.Музыки тоже держим в памяти множеством
+    liked_cache = data.get("yandex_liked_cache")
+    if isinstance(liked_cache, list):
+        state["yandex_liked_cache"].update(str(x) for x in liked_cache)
+    if isinstance(data.get("yandex_liked_cache_revision"), int):
+        state["yandex_liked_cache_revision"] = data["yandex_liked_cache_revision"]
 
-    return data
+    return state
 
 
 def save_state(state: Dict[str, Any]) -> None:
     """Сохраняем состояние в JSON-файл (через временный файл)."""
+    # в памяти processed_spotify_ids — set; на диске обычные ID склеиваем в одну строку
+    # фиксированной ширины (без кавычек и запятых на каждый), остальные — списком
+    data = dict(state)
+    processed = sorted(state["processed_spotify_ids"])
+    data["processed_spotify_ids_packed"] = "".join(
+        x for x in processed if len(x) == SPOTIFY_ID_LEN
+    )
+    data["processed_spotify_ids"] = [x for x in processed if len(x) != SPOTIFY_ID_LEN]
+    # кэш поиска пополняется из потоков поиска — сериализуем снимок. Записи по уже
+    # обработанным трекам больше не читаются, а протухшие не используются — их не пишем,
+    # чтобы кэш не рос вместе со всей библиотекой
+    now = time.time()
+    processed_set = state["processed_spotify_ids"]
+    data["yandex_search_cache"] = {
+        spotify_id: entry
+        for spotify_id, entry in dict(state["yandex_search_cache"]).items()
+        if spotify_id not in processed_set and is_search_cache_entry_fresh(entry, now)
+    }
+    data["yandex_liked_cache"] = sorted(state["yandex_liked_cache"])
+
     tmp_path = STATE_FILE + ".tmp"
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_SORT_KEYS))
     os.replace(tmp_path, STATE_FILE)
 
 
-def fetch_yandex_liked_ids(ym: Client) -> Set[str]:
+def fetch_yandex_liked_ids(ym: Client, state: Dict[str, Any]) -> Set[str]:
     """
     Получаем множество уже лайкнутых треков Я.Музыки в формате "track_id:album_id",
     чтобы не дублировать лайки.
+
+    Список кэшируется в state вместе с ревизией библиотеки: если с прошлого
+    запуска ревизия не изменилась, Я.Музыка не присылает треки и мы берём кэш.
+    Возвращаемое множество — тот же объект, что лежит в state, так что лайки,
+    добавленные за прогон, попадут в кэш при сохранении состояния.
     """
-    print("Получаем текущие лайки Яндекс.Музыки...")
-    result: Set[str] = set()
+    log.info("Получаем текущие лайки Яндекс.Музыки...")
+    cached: Set[str] = state["yandex_liked_cache"]
+    cached_revision: Optional[int] = state["yandex_liked_cache_revision"]
+
     try:
-        likes = ym.users_likes_tracks()
-        for item in likes:
-            track_id = getattr(item, "id", None)
-            album_id = getattr(item, "album_id", None)
-            if track_id and album_id:
-                result.add(f"{track_id}:{album_id}")
+        likes = call_with_backoff(
+            partial(ym.users_likes_tracks, if_modified_since_revision=cached_revision or 0),
+            label="получении лайков Я.Музыки",
+        )
     except Exception as e:
-        print(f"   Не удалось получить лайки Я.Музыки: {e}")
-    print(f"Всего лайков в Яндекс.Музыке сейчас: {len(result)}")
+        log.warning("   Не удалось получить лайки Я.Музыки: %s", e)
+        if cached:
+            log.info("   Использую сохранённый список лайков.")
+        log.info("Всего лайков в Яндекс.Музыке сейчас: %d", len(cached))
+        return cached
+
+    revision = getattr(likes, "revision", None)
+    if cached_revision is not None and (likes is None or revision == cached_revision):
+        log.info("   Лайки не менялись с прошлого запуска — беру сохранённый список.")
+        log.info("Всего лайков в Яндекс.Музыке сейчас: %d", len(cached))
+        return cached
+
+    result: Set[str] = set()
+    for item in likes or []:
+        track_id = getattr(item, "id", None)
+        album_id = getattr(item, "album_id", None)
+        if track_id and album_id:
+            result.add(f"{track_id}:{album_id}")
+
+    state["yandex_liked_cache"] = result
+    state["yandex_liked_cache_revision"] = revision
+    log.info("Всего лайков в Яндекс.Музыке сейчас: %d", len(result))
     return result
 
 
+def _collect_page_tracks(
+    items: List[Dict[str, Any]],
+    since_dt: Optional[datetime],
+    since_raw: Optional[str],
+    processed_ids: Set[str],
+    out: List[SpotifyLike],
+) -> Tuple[bool, int, Optional[str]]:
+    """
+    Добавляем треки одной страницы Spotify в out (кроме уже обработанных).
+    since_raw — та же отметка строкой, если она в каноническом виде (или None).
+    Возвращаем (stop, skipped, newest): stop=True, если дошли до лайка не новее
+    since_dt — дальше можно не идти; skipped — сколько треков отброшено как
+    обработанные ранее; newest — added_at первого нового лайка на странице
+    (включая отброшенные), чтобы двигать отметку времени и по ним.
+    """
+    skipped = 0
+    newest: Optional[str] = None
+    for item in items:
+        track = item.get("track") or {}
+        if not track:
+            continue
+
+        track_id = track.get("id")
+        if not track_id:
+            continue
+
+        added_raw = item.get("added_at")  # строка ISO от Spotify
+
+        # если задан since_dt и текущий лайк старее или равен — дальше можно не идти
+        if since_dt and is_not_newer_than(added_raw, since_raw, since_dt):
+            return True, skipped, newest
+
+        if newest is None:
+            newest = added_raw
+
+        # обработанные ранее (например, до падения прошлого запуска) даже не разбираем
+        if track_id in processed_ids:
+            skipped += 1
+            continue
+
+        album = track.get("album") or {}
+
+        out.append(
+            SpotifyLike(
+                id=track_id,
+                name=track.get("name", ""),
+                artists=tuple(a.get("name", "") for a in track.get("artists", [])),
+                album_name=album.get("name", ""),
+                duration_ms=track.get("duration_ms", 0),
+                added_at=added_raw,
+            )
+        )
+
+    return False, skipped, newest
+
+
 def fetch_spotify_liked_tracks(
     sp: spotipy.Spotify,
     last_added_at: Optional[str],
+    processed_ids: Set[str],
     page_limit: int = 50,
-) -> List[Dict[str, Any]]:
+) -> Tuple[List[SpotifyLike], int, Optional[str]]:
     """
     Получаем ТОЛЬКО НОВЫЕ любимые треки из Spotify.
+    Возвращаем (треки к обработке, сколько новых лайков пропущено как обработанные,
+    added_at самого свежего нового лайка — в том числе пропущенного).
 
     Логика:
       - если last_added_at = None → берем вообще все лайки (первый импорт);
-      - если задана → идём от свежих к старым, пока added_at > last_added_at;
+        первая страница сообщает total, остальные качаем параллельно;
+      - если задана → идём от свежих к старым, пока added_at > last_added_at,
+        первую страницу запрашиваем одну, а если её не хватило —
+        подгружаем несколько следующих страниц наперёд;
       - найденные "новые" потом разворачиваем, чтобы обрабатывать от старых к новым
-        и сохранить хронологию как в Spotify.
+        и сохранить хронологию как в Spotify;
+      - треки из processed_ids отбрасываем сразу, не собирая по ним словари.
     """
     since_dt = parse_spotify_ts(last_added_at)
+    since_raw = (
+        last_added_at if last_added_at and SPOTIFY_TS_RE.fullmatch(last_added_at) else None
+    )
 
     if since_dt:
-        print(f"Получаем НОВЫЕ любимые треки из Spotify (после {last_added_at})...")
+        log.info("Получаем НОВЫЕ любимые треки из Spotify (после %s)...", last_added_at)
     else:
-        print("Получаем ВСЕ любимые треки из Spotify (первый импорт)...")
-
-    new_tracks: List[Dict[str, Any]] = []
-    offset = 0
-
-    while True:
-        page = sp.current_user_saved_tracks(limit=page_limit, offset=offset)
-        items = page.get("items", [])
-        if not items:
-            break
-
-        stop = False
-
-        for item in items:
-            track = item.get("track") or {}
-            if not track:
-                continue
-
-            track_id = track.get("id")
-            if not track_id:
-                continue
-
-            added_raw = item.get("added_at")  # строка ISO от Spotify
-            added_dt = parse_spotify_ts(added_raw)
-
-            # если задан since_dt и текущий лайк старее или равен — дальше можно не идти
-            if since_dt and added_dt and added_dt <= since_dt:
-                stop = True
-                break
-
-            artists = [a.get("name", "") for a in track.get("artists", [])]
-            album = track.get("album") or {}
-
-            new_tracks.append(
-                {
-                    "id": track_id,
-                    "name": track.get("name", ""),
-                    "artists": artists,
-                    "album_name": album.get("name", ""),
-                    "duration_ms": track.get("duration_ms", 0),
-                    "added_at": added_raw,
-                }
+        log.info("Получаем ВСЕ любимые треки из Spotify (первый импорт)...")
+
+    new_tracks: List[SpotifyLike] = []
+    skipped = 0
+    newest_added_at: Optional[str] = None
+
+    if not since_dt:
+        first_page = call_with_backoff(
+            partial(sp.current_user_saved_tracks, limit=page_limit, offset=0),
+            label="получении лайков Spotify",
+        )
+        pages = [first_page]
+        total = first_page.get("total") or 0
+
+        # ex.map возвращает страницы в порядке offset'ов — порядок лайков сохраняется
+        with ThreadPoolExecutor(max_workers=SPOTIFY_FETCH_WORKERS) as ex:
+            pages.extend(
+                ex.map(
+                    lambda offset: call_with_backoff(
+                        partial(sp.current_user_saved_tracks, limit=page_limit, offset=offset),
+                        label="получении лайков Spotify",
+                    ),
+                    range(page_limit, total, page_limit),
+                )
             )
 
-        if stop:
-            break
+        for page in pages:
+            _, page_skipped, page_newest = _collect_page_tracks(
+                page.get("items", []), None, None, processed_ids, new_tracks
+            )
+            skipped += page_skipped
+            # страницы идут от свежих к старым — запоминаем первый встреченный
+            if newest_added_at is None:
+                newest_added_at = page_newest
 
-        offset += len(items)
-        if len(items) < page_limit:
-            break
+    else:
+        executor = ThreadPoolExecutor(max_workers=SPOTIFY_PREFETCH_PAGES)
+        pending: Deque[Future] = deque()
+        next_offset = 0
+        # обычно все новые лайки на первой странице — её запрашиваем одну,
+        # а наперёд качаем, только если первой страницы не хватило
+        prefetch = 1
+        try:
+            while True:
+                # держим несколько следующих страниц "в полёте"
+                while len(pending) < prefetch:
+                    pending.append(
+                        executor.submit(
+                            call_with_backoff,
+                            partial(
+                                sp.current_user_saved_tracks,
+                                limit=page_limit,
+                                offset=next_offset,
+                            ),
+                            label="получении лайков Spotify",
+                        )
+                    )
+                    next_offset += page_limit
+
+                page = pending.popleft().result()
+                items = page.get("items", [])
+                if not items:
+                    break
+
+                stop, page_skipped, page_newest = _collect_page_tracks(
+                    items, since_dt, since_raw, processed_ids, new_tracks
+                )
+                skipped += page_skipped
+                if newest_added_at is None:
+                    newest_added_at = page_newest
+                if stop:
+                    break
+
+                if len(items) < page_limit:
+                    break
+                prefetch = SPOTIFY_PREFETCH_PAGES
+        finally:
+            # лишние страницы, запрошенные наперёд, больше не нужны
+            executor.shutdown(wait=False, cancel_futures=True)
 
     # Spotify отдаёт от новых к старым, а нам для сохранения хронологии
     # выгодно идти от старых к новым.
     new_tracks.reverse()
 
-    print(f"Новых треков из Spotify для обработки: {len(new_tracks)}")
-    return new_tracks
+    log.info("Новых треков из Spotify для обработки: %d", len(new_tracks))
+    return new_tracks, skipped, newest_added_at
 
 
 def build_yandex_like_id(track_obj: Any) -> Optional[str]:
@@ -268,29 +657,107 @@ def build_yandex_like_id(track_obj: Any) -> Optional[str]:
     return f"{track_id}:{album_id}"
 
 
-def find_best_yandex_match(ym: Client, track: Dict[str, Any]) -> Optional[Any]:
+def search_query_key(track: SpotifyLike) -> Tuple[Tuple[str, ...], str]:
     """
-    Ищем лучший матч трека в Яндекс.Музыке.
-    Возвращаем объект Track или None.
+    Ключ поискового запроса: треки с одинаковыми артистами и названием
+    (сборники, разные версии альбома) ищем в Я.Музыке один раз.
     """
-    name = track["name"]
-    artists_list = track["artists"]
-    artists_str = ", ".join(artists_list)
-    query = f"{artists_str} — {name}"
+    return track.artists_norm, track.name_norm
 
-    last_error: Optional[Exception] = None
 
-    for attempt in range(3):
-        try:
-            search_result = ym.search(text=query, type_="track")
-            break
-        except TimedOutError as e:
-            last_error = e
-            print(f"   Yandex API timeout при поиске '{query}' (попытка {attempt + 1}/3)")
-            time.sleep(3)
-    else:
-        print(f"   Не удалось обратиться к Я.Музыке для '{query}': {last_error}")
+def score_yandex_candidate(track: SpotifyLike, candidate: Any) -> float:
+    """
+    Насколько трек Я.Музыки похож на трек Spotify: доля совпавших артистов
+    плюс совпадение названия, минус штраф за разницу длительности.
+    """
+    score = 0.0
+
+    ya_artists = {
+        normalize_text(getattr(a, "name", None) or "")
+        for a in getattr(candidate, "artists", None) or []
+    }
+    if track.artists_norm:
+        score += sum(a in ya_artists for a in track.artists_norm) / len(track.artists_norm)
+
+    ya_title = normalize_text(getattr(candidate, "title", None) or "")
+    if ya_title and ya_title == track.name_norm:
+        score += 1.0
+    elif ya_title and track.name_norm and (
+        ya_title in track.name_norm or track.name_norm in ya_title
+    ):
+        # "Song" vs "Song (Remastered 2011)" и т.п.
+        score += 0.5
+
+    ya_duration = getattr(candidate, "duration_ms", None)
+    if ya_duration and track.duration_ms:
+        diff_seconds = abs(ya_duration - track.duration_ms) / 1000
+        score -= min(diff_seconds / DURATION_PENALTY_SECONDS, 1.0)
+
+    return score
+
+
+def format_ya_track_title(ya_track: Any) -> str:
+    """
+    "артисты — название" трека Я.Музыки — для подробного лога.
+    """
+    ya_artists = ", ".join(a.name for a in getattr(ya_track, "artists", None) or [])
+    return f"{ya_artists} — {getattr(ya_track, 'title', None)}"
+
+
+def resolve_ya_track_metadata(ym: Client, like_id: str) -> Optional[str]:
+    """
+    Получаем "артисты — название" трека Я.Музыки по 'track_id:album_id'.
+    Это отдельный запрос к API, поэтому зовём только для подробного лога
+    и только если трека нет под рукой (результат взят из кэша поиска).
+    """
+    try:
+        tracks = call_with_backoff(
+            partial(ym.tracks, [like_id]),
+            label=f"получении трека {like_id}",
+        )
+    except Exception as e:
+        log.debug("   Не удалось получить трек Я.Музыки %s: %s", like_id, e)
+        return None
+    if not tracks:
         return None
+    return format_ya_track_title(tracks[0])
+
+
+def find_best_yandex_match(
+    ym: Client,
+    track: SpotifyLike,
+    search_cache: Optional[Dict[str, Any]] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Ищем лучший матч трека в Яндекс.Музыке.
+    Возвращаем (like_id, ya_title): like_id вида 'track_id:album_id', None (не найдено)
+    или SEARCH_FAILED, если Я.Музыка так и не ответила; ya_title — "артисты — название"
+    найденного трека, если он был получен поиском (при попадании в кэш — None).
+    Неповторяемые ошибки (в том числе UnauthorizedError) пробрасываем дальше.
+
+    Если передан search_cache, сначала смотрим в него (с учётом TTL),
+    а результат поиска, на который Я.Музыка ответила, — найден трек или нет —
+    записываем обратно; SEARCH_FAILED не кэшируется.
+    """
+    spotify_id = track.id
+    artists_str = ", ".join(track.artists)
+    query = f"{artists_str} — {track.name}"
+
+    if search_cache is not None:
+        entry = search_cache.get(spotify_id)
+        if is_search_cache_entry_fresh(entry, time.time()):
+            return entry.get("like_id"), None
+
+    try:
+        search_result = call_with_backoff(
+            partial(ym.search, text=query, type_="track"),
+            label=f"поиске '{query}'",
+        )
+    except Exception as e:
+        if not is_retryable_error(e):
+            raise
+        log.warning("   Не удалось обратиться к Я.Музыке для '%s': %s", query, e)
+        return SEARCH_FAILED, None
 
     try:
         if (
@@ -298,51 +765,157 @@ def find_best_yandex_match(ym: Client, track: Dict[str, Any]) -> Optional[Any]:
             or not getattr(search_result, "tracks", None)
             or not search_result.tracks.results
         ):
-            return None
-
-        # простая стратегия — берём первый результат
-        return search_result.tracks.results[0]
+            ya_track = None
+        else:
+            # из первых результатов берём самый похожий; при равенстве — более
+            # релевантный по мнению Я.Музыки (max возвращает первый максимум)
+            ya_track = max(
+                search_result.tracks.results[:YANDEX_MATCH_CANDIDATES],
+                key=lambda candidate: score_yandex_candidate(track, candidate),
+            )
     except Exception as e:
-        print(f"   Ошибка при обработке результатов Я.Музыки для '{query}': {e}")
-        return None
+        log.warning("   Ошибка при обработке результатов Я.Музыки для '%s': %s", query, e)
+        return None, None
+
+    like_id: Optional[str] = None
+    ya_title: Optional[str] = None
+    if ya_track is not None:
+        like_id = build_yandex_like_id(ya_track)
+        if like_id:
+            ya_title = format_ya_track_title(ya_track)
+        else:
+            log.warning("   Не удалось собрать like_id для '%s'", query)
+
+    if search_cache is not None:
+        # вызывается из потоков поиска: присваивание ключа атомарно,
+        # а записи целиком заменяются, а не мутируются
+        search_cache[spotify_id] = {
+            "like_id": like_id,
+            "queried_at": int(time.time()),
+        }
+
+    return like_id, ya_title
 
 
 def like_yandex_track(
     ym: Client,
-    ya_track: Any,
+    like_id: str,
     title_for_log: str,
     existing_likes: Set[str],
-) -> bool:
+) -> Optional[bool]:
     """
-    Лайкаем трек в Яндекс.Музыке, если его там ещё нет.
-    Возвращаем True при успехе (или если уже лайкнут), False при фейле.
+    Лайкаем трек в Яндекс.Музыке (like_id = 'track_id:album_id'), если его там ещё нет.
+    Возвращаем True при успехе (или если уже лайкнут), False, если Я.Музыка лайк
+    отклонила, и None, если помешали временные ошибки API (повторы исчерпаны) —
+    такой трек стоит попробовать снова в следующий запуск.
     """
-    like_id = build_yandex_like_id(ya_track)
-    if not like_id:
-        print(f"   Не удалось собрать like_id для '{title_for_log}'")
-        return False
-
     if like_id in existing_likes:
-        print(f"   Уже есть в 'Мне нравится' — лайк не дублирую.")
+        log.debug("   Уже есть в 'Мне нравится' — лайк не дублирую: %s", title_for_log)
         return True
 
-    for attempt in range(3):
+    try:
+        call_with_backoff(
+            partial(ym.users_likes_tracks_add, [like_id]),
+            label=f"лайке '{title_for_log}'",
+        )
+    except UnauthorizedError:
+        raise
+    except Exception as e:
+        log.warning("   Ошибка при лайке трека в Яндекс.Музыке '%s': %s", title_for_log, e)
+        return None if is_retryable_error(e) else False
+
+    existing_likes.add(like_id)
+    return True
+
+
+def like_yandex_tracks(
+    ym: Client,
+    likes: List[Tuple[str, str]],
+    existing_likes: Set[str],
+) -> Tuple[Set[str], Set[str]]:
+    """
+    Лайкаем пачку треков (like_id, title_for_log) одним запросом.
+    Если Я.Музыка пачку отклонила — лайкаем по одному, чтобы отсеять проблемные треки.
+    Возвращаем (like_id, которые теперь есть в "Мне нравится";
+    like_id, которые не удалось лайкнуть из-за временных ошибок API).
+    """
+    # dict.fromkeys — убираем повторы, сохраняя порядок (хронологию)
+    titles = dict(likes)
+    new_ids = [like_id for like_id in dict.fromkeys(titles) if like_id not in existing_likes]
+    failed: Set[str] = set()
+
+    if new_ids:
         try:
-            ym.users_likes_tracks_add([like_id])
-            existing_likes.add(like_id)
-            return True
-        except TimedOutError:
-            print(
-                f"   Yandex API timeout при лайке '{title_for_log}' "
-                f"(попытка {attempt + 1}/3)"
+            call_with_backoff(
+                partial(ym.users_likes_tracks_add, new_ids),
+                label=f"лайке {len(new_ids)} треков",
             )
-            time.sleep(3)
+            existing_likes.update(new_ids)
+        except UnauthorizedError:
+            raise
         except Exception as e:
-            print(f"   Ошибка при лайке трека в Яндекс.Музыке '{title_for_log}': {e}")
-            return False
+            if is_retryable_error(e):
+                # Я.Музыка недоступна — по одному будет то же самое, пробуем в следующий раз
+                log.warning(
+                    "   Не удалось лайкнуть пачку из %d треков (%s) — повторю позже.",
+                    len(new_ids),
+                    e,
+                )
+                failed.update(new_ids)
+            else:
+                log.warning(
+                    "   Не удалось лайкнуть пачку из %d треков (%s) — лайкаю по одному.",
+                    len(new_ids),
+                    e,
+                )
+                for like_id in new_ids:
+                    if like_yandex_track(ym, like_id, titles[like_id], existing_likes) is None:
+                        failed.add(like_id)
+
+    return {like_id for like_id in titles if like_id in existing_likes}, failed
+
+
+def flush_pending_likes(
+    ym: Client,
+    pending: List[Tuple[str, str, str, Optional[str]]],
+    existing_likes: Set[str],
+    processed_ids: Set[str],
+) -> Tuple[int, int]:
+    """
+    Отправляем накопленные лайки (spotify_id, like_id, human_title, ya_title)
+    в Я.Музыку, помечаем треки пачки обработанными и очищаем pending.
+    Треки, которым помешали временные ошибки API, обработанными не помечаем.
+    Возвращаем (сколько добавлено в "Мне нравится", сколько не удалось из-за ошибок API).
+    """
+    if not pending:
+        return 0, 0
 
-    print(f"   Не удалось лайкнуть '{title_for_log}' после 3 попыток — пропускаю.")
-    return False
+    liked, failed = like_yandex_tracks(
+        ym,
+        [(like_id, human_title) for _, like_id, human_title, _ in pending],
+        existing_likes,
+    )
+
+    added = 0
+    like_failed = 0
+    for spotify_id, like_id, human_title, ya_title in pending:
+        if like_id in liked:
+            log.info("   Добавлен в 'Мне нравится': %s", human_title)
+            if log.isEnabledFor(logging.DEBUG):
+                if ya_title is None:
+                    ya_title = resolve_ya_track_metadata(ym, like_id)
+                log.debug("      в Я.Музыке: %s", ya_title or like_id)
+            added += 1
+        elif like_id in failed:
+            log.warning("   Лайк не удался, повторю в следующий раз: %s", human_title)
+            like_failed += 1
+            continue
+        else:
+            log.warning("   Не удалось добавить трек в 'Мне нравится': %s", human_title)
+        processed_ids.add(spotify_id)
+
+    pending.clear()
+    return added, like_failed
 
 
 def main() -> None:
@@ -350,90 +923,150 @@ def main() -> None:
     ym = init_yandex_client()
 
     state = load_state()
-    processed_ids: Set[str] = set(state.get("processed_spotify_ids", []))
+    processed_ids: Set[str] = state["processed_spotify_ids"]
     last_added_at_str: Optional[str] = state.get("last_spotify_added_at")
 
-    ya_existing_likes = fetch_yandex_liked_ids(ym)
+    ya_existing_likes = fetch_yandex_liked_ids(ym, state)
 
-    spotify_liked = fetch_spotify_liked_tracks(sp, last_added_at_str)
+    todo, skipped_already_processed, newest_added_at = fetch_spotify_liked_tracks(
+        sp, last_added_at_str, processed_ids
+    )
+    # самый свежий новый лайк, включая уже обработанные ранее
+    max_added_dt: Optional[datetime] = parse_spotify_ts(newest_added_at)
 
-    if not spotify_liked:
-        print("Новых любимых треков в Spotify нет — синхронизировать нечего.")
+    if not todo:
+        log.info("Новых любимых треков в Spotify нет — синхронизировать нечего.")
+        # все новые лайки уже обработаны — двигаем отметку, чтобы не перебирать их снова
+        if max_added_dt:
+            state["last_spotify_added_at"] = format_spotify_ts(max_added_dt)
+        # сохраняем и обновлённый кэш лайков Я.Музыки
+        save_state(state)
         return
 
-    total = len(spotify_liked)
+    total = len(todo)
     added = 0
-    skipped_already_processed = 0
     not_found = 0
+    search_failed = 0
+    like_failed = 0
 
-    max_added_dt: Optional[datetime] = parse_spotify_ts(last_added_at_str)
-
-    for idx, track in enumerate(spotify_liked, start=1):
-        spotify_id = track["id"]
-        name = track["name"]
-        artists_str = ", ".join(track["artists"])
-        human_title = f"{artists_str} — {name}"
-
-        added_dt = parse_spotify_ts(track.get("added_at"))
-        if added_dt and (max_added_dt is None or added_dt > max_added_dt):
-            max_added_dt = added_dt
-
-        if spotify_id in processed_ids:
-            skipped_already_processed += 1
-            continue
-
-        print(f"[{idx}/{total}] Ищу в Яндексе: {human_title}")
-
-        ya_track = find_best_yandex_match(ym, track)
-
-        if ya_track is None:
-            print("   Не найдено подходящего трека в Яндекс.Музыке.")
-            not_found += 1
-            processed_ids.add(spotify_id)
-            state["processed_spotify_ids"] = list(processed_ids)
-            if max_added_dt:
-                state["last_spotify_added_at"] = format_spotify_ts(max_added_dt)
-            save_state(state)
-            continue
-
-        success = like_yandex_track(ym, ya_track, human_title, ya_existing_likes)
+    processed_since_save = 0
+    # найденные, но ещё не лайкнутые треки: (spotify_id, like_id, human_title, ya_title)
+    pending_likes: List[Tuple[str, str, str, Optional[str]]] = []
 
-        if success:
-            ya_artists = ", ".join(a.name for a in ya_track.artists)
-            ya_title = f"{ya_artists} — {ya_track.title}"
-            print(f"   Добавлен в 'Мне нравится': {ya_title}")
-            added += 1
-        else:
-            print("   Не удалось добавить трек в 'Мне нравится'.")
+    # Поиск в Я.Музыке — чистый сетевой I/O, поэтому запускаем его параллельно,
+    # а лайки и сохранение состояния делаем в основном потоке по порядку,
+    # чтобы не потерять хронологию и не гоняться за processed_ids/ya_existing_likes.
+    executor = ThreadPoolExecutor(max_workers=YANDEX_SEARCH_WORKERS)
+    try:
+        # одинаковые запросы отправляем один раз — результат общий для всей группы
+        search_futures: Dict[Tuple[Tuple[str, ...], str], Future] = {}
+        for track in todo:
+            key = search_query_key(track)
+            if key not in search_futures:
+                search_futures[key] = executor.submit(
+                    find_best_yandex_match, ym, track, state["yandex_search_cache"]
+                )
+
+        # прогресс-бар показываем только в терминале; в лог-файл (cron) идут лишь результаты
+        with logging_redirect_tqdm():
+            for idx, track in enumerate(
+                tqdm(todo, total=total, unit="трек", disable=None), start=1
+            ):
+                spotify_id = track.id
+                artists_str = ", ".join(track.artists)
+                human_title = f"{artists_str} — {track.name}"
+
+                log.debug("[%d/%d] Ищу в Яндексе: %s", idx, total, human_title)
+
+                like_id, ya_title = search_futures[search_query_key(track)].result()
+
+                if like_id == SEARCH_FAILED:
+                    log.warning("   Поиск не удался, повторю в следующий раз: %s", human_title)
+                    search_failed += 1
+                elif like_id is None:
+                    log.info("   Не найдено в Яндекс.Музыке: %s", human_title)
+                    not_found += 1
+                    processed_ids.add(spotify_id)
+                    processed_since_save += 1
+                elif like_id in ya_existing_likes:
+                    log.debug("   Уже есть в 'Мне нравится' — лайк не дублирую: %s", human_title)
+                    added += 1
+                    processed_ids.add(spotify_id)
+                    processed_since_save += 1
+                else:
+                    # лайкаем пачками; обработанными треки станут после отправки пачки
+                    pending_likes.append((spotify_id, like_id, human_title, ya_title))
+                    if len(pending_likes) >= YANDEX_LIKE_BATCH:
+                        processed_since_save += len(pending_likes)
+                        batch_added, batch_failed = flush_pending_likes(
+                            ym, pending_likes, ya_existing_likes, processed_ids
+                        )
+                        added += batch_added
+                        like_failed += batch_failed
+
+                if processed_since_save >= STATE_SAVE_EVERY:
+                    save_state(state)
+                    processed_since_save = 0
+
+            batch_added, batch_failed = flush_pending_likes(
+                ym, pending_likes, ya_existing_likes, processed_ids
+            )
+            added += batch_added
+            like_failed += batch_failed
 
-        processed_ids.add(spotify_id)
-        state["processed_spotify_ids"] = list(processed_ids)
-        if max_added_dt:
+        # двигаем отметку времени только когда обработаны все новые треки,
+        # иначе после падения посреди прогона (или неудачного поиска/лайка)
+        # часть лайков больше не попадёт в выборку
+        if max_added_dt and not search_failed and not like_failed:
             state["last_spotify_added_at"] = format_spotify_ts(max_added_dt)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        # даже при ошибке посреди прогона не теряем уже обработанные треки
         save_state(state)
 
-    print("\n=== Готово ===")
-    print(f"Новых треков из Spotify обработано: {total}")
-    print(f"Добавлено в 'Мне нравится': {added}")
-    print(f"Пропущено (обработаны ранее): {skipped_already_processed}")
-    print(f"Не найдено в Яндекс.Музыке: {not_found}")
+    log.info("\n=== Готово ===")
+    log.info("Новых треков из Spotify обработано: %d", total + skipped_already_processed)
+    log.info("Добавлено в 'Мне нравится': %d", added)
+    log.info("Пропущено (обработаны ранее): %d", skipped_already_processed)
+    log.info("Не найдено в Яндекс.Музыке: %d", not_found)
+    if search_failed:
+        log.info("Не удалось проверить из-за ошибок API (повторю позже): %d", search_failed)
+    if like_failed:
+        log.info("Не удалось лайкнуть из-за ошибок API (повторю позже): %d", like_failed)
+
+
+def setup_logging() -> None:
+    """Логи — в stdout одним обработчиком, без префиксов, как раньше print."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    # LOG_LEVEL касается только нашего логгера: чужие (spotipy, urllib3) оставляем
+    # на WARNING — в DEBUG spotipy пишет заголовки запросов вместе с Bearer-токеном
+    root.setLevel(logging.WARNING)
+    try:
+        log.setLevel(LOG_LEVEL)
+    except ValueError:
+        log.setLevel(logging.INFO)
+        log.warning("Неизвестный LOG_LEVEL=%s — использую INFO.", LOG_LEVEL)
+
 
-import sys
 if __name__ == "__main__":
+    setup_logging()
     try:
         main()
 
     # Наши ожидаемые ошибки конфигурации / авторизации
     except (RuntimeError, SpotifyOauthError, UnauthorizedError) as e:
-        print("\n❌ Скрипт остановлен из-за ошибки конфигурации или авторизации.")
-        print(f"   Сообщение: {e}")
-        print("   ➜ Проверьте, правильно ли заполнен файл .env (ключи Spotify и токен Яндекс.Музыки).\n")
+        log.error("\n❌ Скрипт остановлен из-за ошибки конфигурации или авторизации.")
+        log.error("   Сообщение: %s", e)
+        log.error("   ➜ Проверьте, правильно ли заполнен файл .env (ключи Spotify и токен Яндекс.Музыки).\n")
         sys.exit(1)
 
     # Любые другие непредвиденные ошибки
     except Exception as e:
-        print("\n❌ Непредвиденная ошибка во время выполнения скрипта.")
-        print(f"   Тип: {type(e).__name__}")
-        print(f"   Сообщение: {e}")
-        print("   Если ошибка повторяется — создайте issue в репозитории.\n")
+        log.error("\n❌ Непредвиденная ошибка во время выполнения скрипта.")
+        log.error("   Тип: %s", type(e).__name__)
+        log.error("   Сообщение: %s", e)
+        log.error("   Если ошибка повторяется — создайте issue в репозитории.\n")
         sys.exit(1)